@@ -0,0 +1,906 @@
+"""
+端到端压测工具：本地假 RPC / WebSocket / Jupiter 服务 + 真实的 swap.py 跟单逻辑。
+
+- 假服务运行在独立子进程里，只实现 swap.py 用到的那部分接口：
+    JSON-RPC: getTransaction / getBalance / sendTransaction / getTokenAccountsByOwner / getSignatureStatuses
+    WebSocket: logsSubscribe（logsNotification 推送领导交易签名）
+    Helius: /v0/token-holders
+    Jupiter: /quote, /swap
+- 主进程导入 swap.py，把 RPC/WSS/Jupiter 地址指向假服务，直接跑 listen_leader_logs。
+- swap 广播后要过 --confirm-delay-ms 才上链（getTransaction / getTokenAccountsByOwner 才体现），
+  上链时余额不足会记为链上失败（超卖被拒）。
+- 机器人参数默认沿用 swap.py（如 BUY_CONFIRM_WAIT_SEC=15），报告里会列出实际使用的值。
+- 全程不碰真实资金：跟单钱包密钥每次随机生成。
+
+统计：信号吞吐（signals/s）、检测→广播延迟 p50/p99、长时间运行的内存增长、漏单/重复单。
+
+用法：
+    python loadtest.py --profile bursty --duration 120
+    python loadtest.py --profile stress --rpc-error-rate 0.05 --jup-latency-ms 300 --json report.json
+    python loadtest.py --profile bursty --ws-error-rate 0.02 --ws-dup-rate 0.1
+"""
+import os
+import sys
+import json
+import math
+import time
+import base64
+import random
+import struct
+import socket
+import asyncio
+import argparse
+import contextlib
+import tracemalloc
+import multiprocessing
+from collections import Counter
+from typing import Dict, Any, Optional, List, Tuple
+
+from aiohttp import web, WSMsgType, WSCloseCode
+
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+from solders.hash import Hash
+from solders.signature import Signature
+from solders.message import MessageV0
+from solders.transaction import VersionedTransaction
+
+SOL_MINT = "So11111111111111111111111111111111111111112"
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+LAMPORTS_PER_SOL = 1_000_000_000
+TX_FEE_LAMPORTS = 5000
+TOKEN_ACCOUNT_RENT = 2_039_280
+TOKEN_DECIMALS = 6
+
+# ================= 领导交易节奏（burst profile） =================
+# rate:          每秒开启多少轮（泊松到达）；每轮 = 新代币上的一组买入 + hold_sec 后的一组卖出
+# buy_burst:     每轮领导买入拆成几笔
+# sell_burst:    每轮领导卖出拆成几笔
+# burst_gap_ms:  同一组内相邻两笔的间隔（统计按"每组一笔跟单"计，间隔超过冷却/聚合窗口时多出的跟单会记为重复单）
+# hold_sec:      买入组结束到卖出组开始的间隔
+# sell_fraction: 每轮领导卖掉持仓的比例
+PROFILES = {
+    "steady": {"rate": 0.5, "buy_burst": 1, "sell_burst": 1, "burst_gap_ms": 0, "hold_sec": 5, "sell_fraction": 1.0},
+    "bursty": {"rate": 0.5, "buy_burst": 1, "sell_burst": 4, "burst_gap_ms": 300, "hold_sec": 5, "sell_fraction": 1.0},
+    "partial": {"rate": 0.5, "buy_burst": 1, "sell_burst": 3, "burst_gap_ms": 200, "hold_sec": 5, "sell_fraction": 0.6},
+    "stress": {"rate": 5.0, "buy_burst": 2, "sell_burst": 6, "burst_gap_ms": 100, "hold_sec": 3, "sell_fraction": 1.0},
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """最近秩百分位，空列表返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def _token_balance(account_index: int, mint: str, owner: str, amount: int) -> Dict[str, Any]:
+    ui = amount / 10 ** TOKEN_DECIMALS
+    return {
+        "accountIndex": account_index,
+        "mint": mint,
+        "owner": owner,
+        "programId": TOKEN_PROGRAM_ID,
+        "uiTokenAmount": {
+            "amount": str(amount),
+            "decimals": TOKEN_DECIMALS,
+            "uiAmount": ui,
+            "uiAmountString": str(ui),
+        },
+    }
+
+
+# ================= 假服务状态（子进程内） =================
+class StandInState:
+    """假链 + 假 Jupiter 的全部状态，以及压测统计"""
+
+    def __init__(self, cfg: Dict[str, Any]):
+        self.cfg = cfg
+        self.leader = cfg["leader"]
+        self.follower = cfg["follower"]
+        self.slot = 1
+
+        # 链上余额
+        self.leader_lamports = 10_000 * LAMPORTS_PER_SOL
+        self.leader_holdings: Dict[str, int] = {}
+        self.follower_lamports = int(cfg["follower_sol"] * LAMPORTS_PER_SOL)
+        self.follower_tokens: Dict[str, int] = {}
+        self.token_accounts: Dict[Tuple[str, str], str] = {}   # (owner, mint) -> token account
+        self.prices: Dict[str, float] = {}                       # mint -> 每 lamport 换多少基础单位
+
+        # 已上链交易与待广播的 swap
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+        self.pending_swaps: Dict[str, Dict[str, Any]] = {}      # recentBlockhash -> quote
+        self.landing: set = set()                                # 已广播、确认延迟内尚未上链的 swap
+
+        # WebSocket 订阅
+        self.subscribers: Dict[web.WebSocketResponse, int] = {}
+        self.next_sub_id = 1
+        self.subscribed = asyncio.Event()
+
+        # 统计
+        self.counters: Counter = Counter()
+        self.bursts: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (side, mint) -> burst
+        self.leader_sigs: Dict[str, Tuple[str, str]] = {}         # sig -> (side, mint)
+        self.leader_fetches: Counter = Counter()                  # sig -> getTransaction 次数
+        self.emit_started_at: Optional[float] = None
+        self.emit_done_at: Optional[float] = None
+        self.last_fetch_at: Optional[float] = None
+        self.warmed_up = asyncio.Event()                          # 机器人已处理 warmup_signals 个信号
+
+    # ---------- 注入延迟 / 错误 ----------
+    async def delay(self, service: str):
+        latency = self.cfg[f"{service}_latency_ms"]
+        jitter = self.cfg[f"{service}_jitter_ms"]
+        ms = random.uniform(max(0.0, latency - jitter), latency + jitter)
+        if ms > 0:
+            await asyncio.sleep(ms / 1000)
+
+    def should_fail(self, service: str) -> bool:
+        return random.random() < self.cfg[f"{service}_error_rate"]
+
+    # ---------- 辅助 ----------
+    def token_account(self, owner: str, mint: str) -> str:
+        key = (owner, mint)
+        if key not in self.token_accounts:
+            self.token_accounts[key] = str(Pubkey.new_unique())
+        return self.token_accounts[key]
+
+    def price(self, mint: str) -> float:
+        if mint not in self.prices:
+            self.prices[mint] = random.uniform(0.5, 50.0)
+        return self.prices[mint]
+
+    def build_tx(self, sig: str, signer: str, mint: str,
+                 lamports_pre: int, lamports_post: int,
+                 token_pre: int, token_post: int,
+                 err: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """构造 jsonParsed 格式的 getTransaction 结果（只含 swap.py 读取的字段）；err 非空表示链上执行失败"""
+        self.slot += 1
+        token_acc = self.token_account(signer, mint)
+        pre_tokens = [_token_balance(1, mint, signer, token_pre)] if token_pre > 0 else []
+        post_tokens = [_token_balance(1, mint, signer, token_post)]
+        return {
+            "slot": self.slot,
+            "blockTime": int(time.time()),
+            "version": 0,
+            "transaction": {
+                "signatures": [sig],
+                "message": {
+                    "accountKeys": [
+                        {"pubkey": signer, "writable": True, "signer": True, "source": "transaction"},
+                        {"pubkey": token_acc, "writable": True, "signer": False, "source": "transaction"},
+                    ],
+                    "recentBlockhash": str(Hash.new_unique()),
+                    "instructions": [],
+                },
+            },
+            "meta": {
+                "err": err,
+                "status": {"Ok": None} if err is None else {"Err": err},
+                "fee": TX_FEE_LAMPORTS,
+                "preBalances": [lamports_pre, TOKEN_ACCOUNT_RENT],
+                "postBalances": [lamports_post, TOKEN_ACCOUNT_RENT],
+                "innerInstructions": [],
+                "logMessages": [],
+                "preTokenBalances": pre_tokens,
+                "postTokenBalances": post_tokens,
+                "rewards": [],
+            },
+        }
+
+
+# ================= 领导交易生成器 =================
+async def _notify(state: StandInState, sig: str, key: Tuple[str, str]):
+    """
+    推送一条 logsNotification。按 ws_error_rate 随机断开订阅连接（这条推送对该连接丢失，
+    机器人需要走重连逻辑），按 ws_dup_rate 在 0~1 秒后把同一条推送再发一次（模拟重放）。
+    """
+    await state.delay("ws")
+    sent = []
+    for ws, sub_id in list(state.subscribers.items()):
+        if state.should_fail("ws"):
+            state.counters["ws_disconnects_injected"] += 1
+            state.subscribers.pop(ws, None)
+            await ws.close(code=WSCloseCode.INTERNAL_ERROR, message=b"stand-in disconnect")
+            continue
+        msg = {
+            "jsonrpc": "2.0",
+            "method": "logsNotification",
+            "params": {
+                "result": {
+                    "context": {"slot": state.slot},
+                    "value": {"signature": sig, "err": None, "logs": []},
+                },
+                "subscription": sub_id,
+            },
+        }
+        try:
+            await ws.send_str(json.dumps(msg))
+            sent.append((ws, msg))
+        except Exception:
+            state.subscribers.pop(ws, None)
+    if not sent:
+        state.counters["notifications_undelivered"] += 1
+        return
+    state.counters["notifications"] += 1
+    burst = state.bursts[key]
+    if burst["first_notify_at"] is None:
+        burst["first_notify_at"] = time.monotonic()
+
+    for ws, msg in sent:
+        if random.random() >= state.cfg["ws_dup_rate"]:
+            continue
+        await asyncio.sleep(random.uniform(0, 1))
+        try:
+            await ws.send_str(json.dumps(msg))
+            state.counters["ws_duplicates_injected"] += 1
+        except Exception:
+            pass
+
+
+def _emit_leader_trade(state: StandInState, side: str, mint: str, lamports_delta: int,
+                       token_pre: int, token_post: int, tasks: set):
+    sig = str(Signature.new_unique())
+    lamports_pre = state.leader_lamports
+    state.leader_lamports += lamports_delta - TX_FEE_LAMPORTS
+    state.leader_holdings[mint] = token_post
+    state.transactions[sig] = state.build_tx(
+        sig, state.leader, mint, lamports_pre, state.leader_lamports, token_pre, token_post
+    )
+
+    key = (side, mint)
+    burst = state.bursts.setdefault(key, {"events": 0, "first_notify_at": None, "broadcasts": [], "failed": 0})
+    burst["events"] += 1
+    state.leader_sigs[sig] = key
+    state.counters["leader_trades"] += 1
+
+    task = asyncio.create_task(_notify(state, sig, key))
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+
+async def _leader_round(state: StandInState, mint: str, tasks: set):
+    """一轮：新代币上 buy_burst 笔买入，hold_sec 后 sell_burst 笔卖出"""
+    cfg = state.cfg
+    gap = cfg["burst_gap_ms"] / 1000
+
+    for i in range(cfg["buy_burst"]):
+        spent = int(random.uniform(0.5, 5.0) * LAMPORTS_PER_SOL)
+        pre = state.leader_holdings.get(mint, 0)
+        post = pre + int(spent * state.price(mint))
+        _emit_leader_trade(state, "buy", mint, -spent, pre, post, tasks)
+        if i < cfg["buy_burst"] - 1:
+            await asyncio.sleep(gap)
+
+    await asyncio.sleep(cfg["hold_sec"])
+
+    holding = state.leader_holdings.get(mint, 0)
+    target_left = holding - int(holding * cfg["sell_fraction"])
+    pieces = cfg["sell_burst"]
+    for i in range(pieces):
+        pre = state.leader_holdings.get(mint, 0)
+        if i == pieces - 1:
+            post = target_left
+        else:
+            post = pre - (holding - target_left) // pieces
+        received = int((pre - post) / state.price(mint))
+        _emit_leader_trade(state, "sell", mint, received, pre, post, tasks)
+        if i < pieces - 1:
+            await asyncio.sleep(gap)
+
+
+async def emit_leader_trades(state: StandInState):
+    """订阅建立后开始按泊松节奏开新轮，duration 秒后停止开新轮并等已开的轮次结束"""
+    await state.subscribed.wait()
+    state.emit_started_at = time.monotonic()
+    notify_tasks: set = set()
+    rounds = []
+    while time.monotonic() - state.emit_started_at < state.cfg["duration"]:
+        mint = str(Pubkey.new_unique())
+        rounds.append(asyncio.create_task(_leader_round(state, mint, notify_tasks)))
+        await asyncio.sleep(random.expovariate(state.cfg["rate"]))
+    await asyncio.gather(*rounds)
+    if notify_tasks:
+        await asyncio.gather(*notify_tasks)
+    state.emit_done_at = time.monotonic()
+
+
+# ================= 假 Helius：JSON-RPC + WebSocket + token-holders =================
+def _rpc_result(req_id: Any, result: Any) -> web.Response:
+    return web.json_response({"jsonrpc": "2.0", "result": result, "id": req_id})
+
+
+def _rpc_error(req_id: Any, code: int, message: str, status: int = 200) -> web.Response:
+    return web.json_response(
+        {"jsonrpc": "2.0", "error": {"code": code, "message": message}, "id": req_id}, status=status
+    )
+
+
+async def handle_rpc(request: web.Request) -> web.StreamResponse:
+    state: StandInState = request.app["state"]
+    body = await request.json()
+    req_id = body.get("id")
+    method = body.get("method")
+    params = body.get("params", [])
+    state.counters[f"rpc.{method}"] += 1
+
+    await state.delay("rpc")
+    if state.should_fail("rpc"):
+        state.counters["rpc_errors_injected"] += 1
+        return _rpc_error(req_id, 429, "Too many requests (stand-in)", status=429)
+
+    if method == "getTransaction":
+        sig = params[0]
+        if sig in state.leader_sigs:
+            state.leader_fetches[sig] += 1
+            state.last_fetch_at = time.monotonic()
+            if len(state.leader_fetches) >= state.cfg["warmup_signals"]:
+                state.warmed_up.set()
+        return _rpc_result(req_id, state.transactions.get(sig))
+
+    if method == "getBalance":
+        lamports = state.follower_lamports if params[0] == state.follower else 0
+        return _rpc_result(req_id, {"context": {"slot": state.slot}, "value": lamports})
+
+    if method == "getTokenAccountsByOwner":
+        owner, mint = params[0], params[1].get("mint")
+        amount = state.follower_tokens.get(mint, 0) if owner == state.follower else 0
+        value = []
+        if amount > 0:
+            data = (bytes(Pubkey.from_string(mint)) + bytes(Pubkey.from_string(owner))
+                    + struct.pack("<Q", amount)).ljust(165, b"\0")
+            value.append({
+                "pubkey": state.token_account(owner, mint),
+                "account": {
+                    "data": [base64.b64encode(data).decode(), "base64"],
+                    "executable": False,
+                    "lamports": TOKEN_ACCOUNT_RENT,
+                    "owner": TOKEN_PROGRAM_ID,
+                    "rentEpoch": 0,
+                    "space": 165,
+                },
+            })
+        return _rpc_result(req_id, {"context": {"slot": state.slot}, "value": value})
+
+    if method == "getSignatureStatuses":
+        value = []
+        for sig in params[0]:
+            tx = state.transactions.get(sig)
+            value.append(None if tx is None else {
+                "slot": tx["slot"],
+                "confirmations": None,
+                "err": tx["meta"]["err"],
+                "confirmationStatus": "confirmed",
+            })
+        return _rpc_result(req_id, {"context": {"slot": state.slot}, "value": value})
+
+    if method == "sendTransaction":
+        return _send_transaction(state, req_id, params[0])
+
+    return _rpc_error(req_id, -32601, f"Method not found: {method}")
+
+
+def _send_transaction(state: StandInState, req_id: Any, tx_b64: str) -> web.Response:
+    """
+    按 recentBlockhash 找回 /swap 生成的报价，记录广播并立即返回签名。
+    余额在 confirm_delay_ms 后才结算（见 _land_swap），期间 getTransaction 查不到、
+    getTokenAccountsByOwner 仍是旧余额，和真实链上的确认延迟一致。
+    """
+    tx = VersionedTransaction.from_bytes(base64.b64decode(tx_b64))
+    sig = str(tx.signatures[0])
+    quote = state.pending_swaps.pop(str(tx.message.recent_blockhash), None)
+    if quote is None:
+        state.counters["send_unknown_tx"] += 1
+        return _rpc_error(req_id, -32002, "Blockhash not found")
+
+    if quote["inputMint"] == SOL_MINT:
+        side, mint = "buy", quote["outputMint"]
+    else:
+        side, mint = "sell", quote["inputMint"]
+    state.counters[f"follow_{side}s"] += 1
+    burst = state.bursts.get((side, mint))
+    if burst is None:
+        state.counters["broadcasts_unmatched"] += 1
+    else:
+        burst["broadcasts"].append(time.monotonic())
+
+    state.landing.add(sig)
+    asyncio.get_running_loop().call_later(
+        state.cfg["confirm_delay_ms"] / 1000, _land_swap, state, sig, side, mint, quote, burst
+    )
+    return _rpc_result(req_id, sig)
+
+
+def _land_swap(state: StandInState, sig: str, side: str, mint: str,
+               quote: Dict[str, Any], burst: Optional[Dict[str, Any]]):
+    """确认延迟到期：按上链时的余额执行 swap，余额不足则记为链上失败（交易仍可查到，带 err）"""
+    state.landing.discard(sig)
+    in_amount, out_amount = int(quote["inAmount"]), int(quote["outAmount"])
+    lamports_pre = state.follower_lamports
+    token_pre = state.follower_tokens.get(mint, 0)
+    err = None
+    if side == "buy":
+        if in_amount + TX_FEE_LAMPORTS > lamports_pre:
+            err = {"InstructionError": [0, {"Custom": 1}]}
+        else:
+            state.follower_lamports -= in_amount + TX_FEE_LAMPORTS
+            state.follower_tokens[mint] = token_pre + out_amount
+    else:
+        if in_amount > token_pre:
+            state.counters["oversell_rejected"] += 1
+            err = {"InstructionError": [0, {"Custom": 1}]}
+        else:
+            state.follower_lamports += out_amount - TX_FEE_LAMPORTS
+            state.follower_tokens[mint] = token_pre - in_amount
+    if err is not None:
+        state.follower_lamports -= TX_FEE_LAMPORTS   # 失败也扣手续费
+        state.counters[f"follow_{side}s_failed"] += 1
+        if burst is not None:
+            burst["failed"] += 1
+
+    state.transactions[sig] = state.build_tx(
+        sig, state.follower, mint, lamports_pre, state.follower_lamports,
+        token_pre, state.follower_tokens.get(mint, 0), err
+    )
+
+
+async def handle_ws(request: web.Request) -> web.WebSocketResponse:
+    state: StandInState = request.app["state"]
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            data = json.loads(msg.data)
+            if data.get("method") != "logsSubscribe":
+                continue
+            sub_id = state.next_sub_id
+            state.next_sub_id += 1
+            await ws.send_str(json.dumps({"jsonrpc": "2.0", "result": sub_id, "id": data.get("id")}))
+            state.subscribers[ws] = sub_id
+            state.counters["ws_subscriptions"] += 1
+            state.subscribed.set()
+    finally:
+        state.subscribers.pop(ws, None)
+    return ws
+
+
+async def handle_token_holders(request: web.Request) -> web.Response:
+    state: StandInState = request.app["state"]
+    state.counters["helius.token_holders"] += 1
+    await state.delay("rpc")
+    if state.should_fail("rpc"):
+        state.counters["rpc_errors_injected"] += 1
+        return web.json_response({"error": "stand-in error"}, status=500)
+    return web.json_response([{"owner": str(Pubkey.new_unique())} for _ in range(20)])
+
+
+# ================= 假 Jupiter =================
+async def handle_quote(request: web.Request) -> web.Response:
+    state: StandInState = request.app["state"]
+    state.counters["jupiter.quote"] += 1
+    await state.delay("jup")
+    if state.should_fail("jup"):
+        state.counters["jup_errors_injected"] += 1
+        return web.json_response({"error": "Could not find any route (stand-in)"}, status=400)
+
+    q = request.query
+    in_mint, out_mint, amount = q["inputMint"], q["outputMint"], int(q["amount"])
+    if in_mint == SOL_MINT:
+        out_amount = int(amount * state.price(out_mint))
+    else:
+        out_amount = int(amount / state.price(in_mint))
+    return web.json_response({
+        "inputMint": in_mint,
+        "inAmount": str(amount),
+        "outputMint": out_mint,
+        "outAmount": str(out_amount),
+        "otherAmountThreshold": str(out_amount),
+        "swapMode": "ExactIn",
+        "slippageBps": int(q.get("slippageBps", 0)),
+        "priceImpactPct": "0",
+        "routePlan": [{
+            "swapInfo": {
+                "ammKey": "stand-in", "label": "stand-in",
+                "inputMint": in_mint, "outputMint": out_mint,
+                "inAmount": str(amount), "outAmount": str(out_amount),
+                "feeAmount": "0", "feeMint": in_mint,
+            },
+            "percent": 100,
+        }],
+        "contextSlot": state.slot,
+    })
+
+
+async def handle_swap(request: web.Request) -> web.Response:
+    """返回一笔以跟单钱包为 payer 的未签名 v0 交易，用唯一 blockhash 关联回报价"""
+    state: StandInState = request.app["state"]
+    state.counters["jupiter.swap"] += 1
+    body = await request.json()
+    await state.delay("jup")
+    if state.should_fail("jup"):
+        state.counters["jup_errors_injected"] += 1
+        return web.json_response({"error": "stand-in swap error"}, status=500)
+
+    blockhash = Hash.new_unique()
+    payer = Pubkey.from_string(body["userPublicKey"])
+    message = MessageV0.try_compile(payer, [], [], blockhash)
+    tx = VersionedTransaction.populate(message, [Signature.default()])
+    state.pending_swaps[str(blockhash)] = body["quoteResponse"]
+    return web.json_response({
+        "swapTransaction": base64.b64encode(bytes(tx)).decode(),
+        "lastValidBlockHeight": state.slot + 150,
+    })
+
+
+# ================= 报告 =================
+def build_report(state: StandInState) -> Dict[str, Any]:
+    latencies: Dict[str, List[float]] = {"buy": [], "sell": []}
+    dropped: Counter = Counter()
+    duplicated: Counter = Counter()
+    failed: Counter = Counter()      # 广播了但全部在链上失败
+    orphan_sells = 0     # 对应的买入本身就漏了，卖出自然也跟不上
+    bursts = Counter()
+    undelivered = 0      # 整组推送都在断线期间丢失
+    for (side, mint), b in state.bursts.items():
+        bursts[side] += 1
+        if b["first_notify_at"] is None:
+            dropped[side] += 1
+            undelivered += 1
+            continue
+        if not b["broadcasts"]:
+            dropped[side] += 1
+            if side == "sell" and not state.bursts.get(("buy", mint), {}).get("broadcasts"):
+                orphan_sells += 1
+            continue
+        duplicated[side] += len(b["broadcasts"]) - 1
+        if b["failed"] >= len(b["broadcasts"]):
+            failed[side] += 1
+        latencies[side].append(b["broadcasts"][0] - b["first_notify_at"])
+
+    all_lat = latencies["buy"] + latencies["sell"]
+    emit_window = (state.emit_done_at or time.monotonic()) - (state.emit_started_at or time.monotonic())
+    processed = len(state.leader_fetches)
+    process_window = ((state.last_fetch_at or 0) - (state.emit_started_at or 0)) if processed else 0
+
+    def ms(v: Optional[float]) -> Optional[float]:
+        return None if v is None else round(v * 1000, 1)
+
+    return {
+        "leader_trades": state.counters["leader_trades"],
+        "notifications": state.counters["notifications"],
+        "signals_emitted_per_sec": round(state.counters["notifications"] / emit_window, 3) if emit_window > 0 else None,
+        "signals_processed": processed,
+        "signals_processed_per_sec": round(processed / process_window, 3) if process_window > 0 else None,
+        "signals_refetched": sum(n - 1 for n in state.leader_fetches.values()),
+        "signals_never_fetched": state.counters["notifications"] - processed,
+        "ws_subscriptions": state.counters["ws_subscriptions"],
+        "ws_disconnects_injected": state.counters["ws_disconnects_injected"],
+        "ws_duplicates_injected": state.counters["ws_duplicates_injected"],
+        "notifications_undelivered": state.counters["notifications_undelivered"],
+        "bursts": dict(bursts),
+        "follow_swaps": {"buy": state.counters["follow_buys"], "sell": state.counters["follow_sells"]},
+        "dropped": dict(dropped),
+        "dropped_sells_without_buy": orphan_sells,
+        "dropped_undelivered": undelivered,
+        "duplicated": dict(duplicated),
+        "failed_onchain": dict(failed),
+        "broadcasts_unmatched": state.counters["broadcasts_unmatched"],
+        "oversell_rejected": state.counters["oversell_rejected"],
+        "unlanded_at_end": len(state.landing),
+        "latency_ms": {
+            "all": {"p50": ms(percentile(all_lat, 50)), "p99": ms(percentile(all_lat, 99)), "n": len(all_lat)},
+            "buy": {"p50": ms(percentile(latencies["buy"], 50)), "p99": ms(percentile(latencies["buy"], 99)),
+                    "n": len(latencies["buy"])},
+            "sell": {"p50": ms(percentile(latencies["sell"], 50)), "p99": ms(percentile(latencies["sell"], 99)),
+                     "n": len(latencies["sell"])},
+        },
+        "counters": dict(state.counters),
+    }
+
+
+# ================= 子进程入口 =================
+def _listen_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+async def _serve_stand_ins(conn, cfg: Dict[str, Any]):
+    state = StandInState(cfg)
+
+    helius = web.Application()
+    helius["state"] = state
+    helius.router.add_get("/", handle_ws)
+    helius.router.add_post("/", handle_rpc)
+    helius.router.add_get("/v0/token-holders", handle_token_holders)
+
+    jupiter = web.Application()
+    jupiter["state"] = state
+    jupiter.router.add_get("/v6/quote", handle_quote)
+    jupiter.router.add_post("/v6/swap", handle_swap)
+
+    runners = []
+    ports = {}
+    for name, app in (("helius", helius), ("jupiter", jupiter)):
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        sock = _listen_socket()
+        await web.SockSite(runner, sock).start()
+        runners.append(runner)
+        ports[name] = sock.getsockname()[1]
+    conn.send(ports)
+
+    loop = asyncio.get_running_loop()
+
+    async def notify_warm_up():
+        await state.warmed_up.wait()
+        conn.send("warmed_up")
+
+    warm = asyncio.create_task(notify_warm_up())
+    await emit_leader_trades(state)
+    conn.send("emission_done")
+
+    cmd = await loop.run_in_executor(None, conn.recv)
+    warm.cancel()
+    if cmd == "report":
+        conn.send(build_report(state))
+    for runner in runners:
+        await runner.cleanup()
+
+
+def _stand_in_main(conn, cfg: Dict[str, Any]):
+    asyncio.run(_serve_stand_ins(conn, cfg))
+
+
+# ================= 主进程：驱动真实 swap.py =================
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _memory_sample(started: float) -> Dict[str, float]:
+    sample = {"t": round(time.monotonic() - started, 1), "rss_mb": round(_rss_bytes() / 2 ** 20, 2)}
+    if tracemalloc.is_tracing():
+        sample["traced_mb"] = round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2)
+    return sample
+
+
+async def _sample_memory(samples: List[Dict[str, float]], interval: float, started: float):
+    while True:
+        samples.append(_memory_sample(started))
+        await asyncio.sleep(interval)
+
+
+def _slope_per_min(points: List[Tuple[float, float]]) -> Optional[float]:
+    """最小二乘斜率，单位 MB/分钟"""
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_v = sum(v for _, v in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if var == 0:
+        return None
+    cov = sum((t - mean_t) * (v - mean_v) for t, v in points)
+    return round(cov / var * 60, 3)
+
+
+def _memory_summary(samples: List[Dict[str, float]], warm_index: Optional[int]) -> Dict[str, Any]:
+    """
+    启动阶段（建立订阅、aiohttp/solana 客户端首次加载）的内存上涨不算增长：
+    基线取预热完成（已处理 warmup_signals 个信号）时的采样，斜率只用基线之后的采样。
+    """
+    if not samples:
+        return {}
+    warmed = warm_index is not None
+    steady = samples[warm_index:] if warmed else samples
+    base = steady[0]
+    summary = {
+        "samples": len(samples),
+        "warmed_up": warmed,
+        "rss_startup_mb": samples[0]["rss_mb"],
+        "rss_baseline_mb": base["rss_mb"],
+        "rss_end_mb": samples[-1]["rss_mb"],
+        "rss_peak_mb": max(s["rss_mb"] for s in samples),
+        "rss_growth_mb": round(samples[-1]["rss_mb"] - base["rss_mb"], 2),
+        "rss_slope_mb_per_min": _slope_per_min([(s["t"], s["rss_mb"]) for s in steady]),
+    }
+    if "traced_mb" in base:
+        summary["traced_baseline_mb"] = base["traced_mb"]
+        summary["traced_end_mb"] = samples[-1]["traced_mb"]
+        summary["traced_growth_mb"] = round(samples[-1]["traced_mb"] - base["traced_mb"], 2)
+        summary["traced_slope_mb_per_min"] = _slope_per_min([(s["t"], s["traced_mb"]) for s in steady])
+    return summary
+
+
+async def run_bot(args, conn, ports: Dict[str, int], swap) -> Dict[str, Any]:
+    swap.RPC_URL = f"http://127.0.0.1:{ports['helius']}/"
+    swap.WSS_URL = f"ws://127.0.0.1:{ports['helius']}/"
+    swap.HELIUS_API_URL = f"http://127.0.0.1:{ports['helius']}"
+    swap.JUPITER_API_URL = f"http://127.0.0.1:{ports['jupiter']}/v6"
+    swap.PROXY = None
+    if args.buy_confirm_wait is not None:
+        swap.BUY_CONFIRM_WAIT_SEC = args.buy_confirm_wait
+
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    samples: List[Dict[str, float]] = []
+    warm_index: Optional[int] = None
+    sampler = asyncio.create_task(_sample_memory(samples, args.mem_interval, started))
+    bot = asyncio.create_task(swap.listen_leader_logs())
+
+    while True:
+        msg = await loop.run_in_executor(None, conn.recv)
+        if msg == "warmed_up":
+            # 预热完成时补一个采样作为内存基线
+            warm_index = len(samples)
+            samples.append(_memory_sample(started))
+            continue
+        assert msg == "emission_done", msg
+        break
+    drain = args.drain
+    if drain is None:
+        drain = swap.SELL_AGGREGATE_WINDOW_SEC + swap.BUY_CONFIRM_WAIT_SEC + 5
+    await asyncio.sleep(drain)
+
+    bot.cancel()
+    sampler.cancel()
+    leftover_sells = len(swap._pending_sells)
+    for pending in list(swap._pending_sells.values()):
+        pending["task"].cancel()
+    await asyncio.gather(bot, sampler, return_exceptions=True)
+
+    conn.send("report")
+    report = await loop.run_in_executor(None, conn.recv)
+    if report == "warmed_up":   # 预热在生成结束后才完成（机器人积压严重）
+        warm_index = len(samples)
+        samples.append(_memory_sample(started))
+        report = await loop.run_in_executor(None, conn.recv)
+    report["run_sec"] = round(time.monotonic() - started, 1)
+    report["memory"] = _memory_summary(samples, warm_index)
+    report["bot_config"] = {
+        "buy_confirm_wait_sec": swap.BUY_CONFIRM_WAIT_SEC,
+        "sell_aggregate_window_sec": swap.SELL_AGGREGATE_WINDOW_SEC,
+        "cooldown_sec": swap.COOLDOWN_SEC,
+    }
+    report["bot_state"] = {
+        "pending_sell_windows": leftover_sells,
+        "cooldown_entries": len(swap._last_action_at),
+        "positions": len(swap.POSITIONS),
+        "unconfirmed_sell_mints": len(swap._unconfirmed_sells),
+        "sell_locks": len(swap._sell_locks),
+    }
+    return report
+
+
+def print_report(report: Dict[str, Any], out=None):
+    out = out or sys.stdout
+    lat = report["latency_ms"]
+    mem = report["memory"]
+    lines = [
+        "================= 压测结果 =================",
+        f"运行时长: {report['run_sec']} s，机器人参数: {report['bot_config']}，"
+        f"确认延迟: {report['profile']['confirm_delay_ms']} ms",
+        f"领导交易: {report['leader_trades']}，推送: {report['notifications']}，"
+        f"机器人处理: {report['signals_processed']}（未处理 {report['signals_never_fetched']}，"
+        f"重复拉取 {report['signals_refetched']}）",
+        f"signals/s: 推送 {report['signals_emitted_per_sec']}，处理 {report['signals_processed_per_sec']}",
+        f"WebSocket: 订阅 {report['ws_subscriptions']} 次，注入断线 {report['ws_disconnects_injected']}，"
+        f"注入重复推送 {report['ws_duplicates_injected']}，断线期间未送达 {report['notifications_undelivered']}",
+        f"检测→广播 延迟(ms): p50={lat['all']['p50']} p99={lat['all']['p99']} (n={lat['all']['n']})",
+        f"  买入: p50={lat['buy']['p50']} p99={lat['buy']['p99']} (n={lat['buy']['n']})",
+        f"  卖出: p50={lat['sell']['p50']} p99={lat['sell']['p99']} (n={lat['sell']['n']})",
+        f"领导交易组: {report['bursts']}，跟单 swap: {report['follow_swaps']}",
+        f"漏单: {report['dropped']}（其中买入已漏导致的卖出 {report['dropped_sells_without_buy']}，"
+        f"推送全部未送达 {report['dropped_undelivered']}）",
+        f"重复单: {report['duplicated']}，链上失败: {report['failed_onchain']}，"
+        f"无法匹配的广播: {report['broadcasts_unmatched']}，超卖被拒: {report['oversell_rejected']}，"
+        f"结束时未上链: {report['unlanded_at_end']}",
+        f"内存: {mem}",
+        f"机器人状态: {report['bot_state']}",
+    ]
+    print("\n".join(lines), file=out)
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="swap.py 端到端压测（本地假 RPC / WebSocket / Jupiter）")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="bursty", help="领导交易节奏预设")
+    p.add_argument("--duration", type=float, default=60, help="领导交易生成时长（秒）")
+    p.add_argument("--drain", type=float, default=None, help="生成结束后继续等待的秒数（默认按窗口和确认等待估算）")
+    # 覆盖 profile
+    p.add_argument("--rate", type=float, help="每秒开启的轮数")
+    p.add_argument("--buy-burst", type=int, help="每轮领导买入笔数")
+    p.add_argument("--sell-burst", type=int, help="每轮领导卖出笔数")
+    p.add_argument("--burst-gap-ms", type=float, help="同组相邻两笔间隔（毫秒）")
+    p.add_argument("--hold-sec", type=float, help="买入组到卖出组的间隔（秒）")
+    p.add_argument("--sell-fraction", type=float, help="每轮领导卖出持仓比例")
+    # 假服务延迟与错误率
+    for service, label in (("rpc", "RPC/Helius"), ("jup", "Jupiter"), ("ws", "WebSocket 推送")):
+        p.add_argument(f"--{service}-latency-ms", type=float, default=0, help=f"{label} 平均延迟（毫秒）")
+        p.add_argument(f"--{service}-jitter-ms", type=float, default=0, help=f"{label} 延迟抖动（毫秒）")
+        p.add_argument(f"--{service}-error-rate", type=float, default=0,
+                       help=f"{label} 错误率 0~1" + ("（每条推送前随机断开连接的概率）" if service == "ws" else ""))
+    p.add_argument("--ws-dup-rate", type=float, default=0, help="WebSocket 推送重复发送的概率 0~1")
+    # 机器人
+    p.add_argument("--follower-sol", type=float, default=1000, help="假链上跟单钱包初始 SOL")
+    p.add_argument("--confirm-delay-ms", type=float, default=1500,
+                   help="swap 广播后多久才在 getTransaction / getTokenAccountsByOwner 中体现（毫秒）")
+    p.add_argument("--buy-confirm-wait", type=float, default=None,
+                   help="覆盖 swap.BUY_CONFIRM_WAIT_SEC（默认沿用 swap.py 的值；调小会让吞吐和延迟好于实盘）")
+    p.add_argument("--mem-interval", type=float, default=5, help="内存采样间隔（秒）")
+    p.add_argument("--warmup-signals", type=int, default=20,
+                   help="机器人处理这么多领导信号后才取内存基线")
+    p.add_argument("--tracemalloc", action="store_true", help="同时记录 tracemalloc 内存（更慢）")
+    p.add_argument("--verbose", action="store_true", help="显示 swap.py 自身的日志输出")
+    p.add_argument("--json", help="把完整报告写入该 JSON 文件")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profile = dict(PROFILES[args.profile])
+    for k in profile:
+        v = getattr(args, k)
+        if v is not None:
+            profile[k] = v
+
+    # 跟单钱包每次随机生成，swap.py 导入时就会读取
+    os.environ["FOLLOWER_SECRET"] = str(Keypair())
+    leader = str(Pubkey.new_unique())
+
+    workdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".loadtest")
+    os.makedirs(workdir, exist_ok=True)
+    if args.tracemalloc:
+        tracemalloc.start()
+    import swap
+    swap.SMART_WALLET = leader
+    swap.POSITIONS_FILE = os.path.join(workdir, "positions.json")
+    swap.POSITIONS.clear()
+
+    cfg = dict(profile)
+    cfg.update({
+        "leader": leader,
+        "follower": swap.FOLLOWER_PUBKEY,
+        "duration": args.duration,
+        "follower_sol": args.follower_sol,
+        "confirm_delay_ms": args.confirm_delay_ms,
+        "warmup_signals": args.warmup_signals,
+    })
+    for service in ("rpc", "jup", "ws"):
+        cfg[f"{service}_latency_ms"] = getattr(args, f"{service}_latency_ms")
+        cfg[f"{service}_jitter_ms"] = getattr(args, f"{service}_jitter_ms")
+        cfg[f"{service}_error_rate"] = getattr(args, f"{service}_error_rate")
+    cfg["ws_dup_rate"] = args.ws_dup_rate
+
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe()
+    proc = ctx.Process(target=_stand_in_main, args=(child_conn, cfg), daemon=True)
+    proc.start()
+    ports = parent_conn.recv()
+    print(f"🧪 假服务已启动: {ports}，profile={args.profile} {profile}")
+
+    # swap.py 日志很多，默认丢到 /dev/null（写进内存缓冲会污染内存增长统计）
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        bot_out = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+        with bot_out:
+            report = asyncio.run(run_bot(args, parent_conn, ports, swap))
+    report["profile"] = {"name": args.profile, **profile, "confirm_delay_ms": args.confirm_delay_ms}
+    proc.join(timeout=10)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ from solders.signature import Signature
 
 from solders.pubkey import Pubkey
 from solana.rpc.types import TokenAccountOpts
+from solana.rpc.commitment import Confirmed
 import struct
 
 # ================= 配置 跟单钱包 和 个人钱包密钥 =================
@@ -24,6 +25,8 @@ FOLLOWER_SECRET = os.getenv("FOLLOWER_SECRET", "Your_Follower_Wallet_Private_Key
 
 RPC_URL = f"https://mainnet.helius-rpc.com/?api-key={API_KEY}"
 WSS_URL = f"wss://mainnet.helius-rpc.com/?api-key={API_KEY}"
+HELIUS_API_URL = "https://api.helius.xyz"
+JUPITER_API_URL = "https://quote-api.jup.ag/v6"
 
 # Jupiter 与 SOL 常量
 SLIPPAGE_TOLERANCE = 0.128  # 20%（一级市场滑点给足以免卡单，自己把控）
@@ -39,8 +42,12 @@ MAX_PER_TRADE_SOL = 0.18             # 单笔最大花费 SOL
 MIN_SOL_RESERVE = 0.02               # 至少保留这么多 SOL 不动
 MIRROR_SELL = True                   # 是否跟单卖出（领导卖，我们也卖）
 COOLDOWN_SEC = 6                     # 同一代币冷却，避免重复触发
+BUY_CONFIRM_WAIT_SEC = 15            # 买入广播后等待确认的时间，再回查到账数量
+SELL_AGGREGATE_WINDOW_SEC = 3        # 卖出聚合窗口：窗口内领导对同一代币的多笔卖出合并为一笔（领导清仓时立即卖出）
+SELL_CONFIRM_TIMEOUT_SEC = 60        # 卖单广播后超过该时间链上余额仍未体现，视为失败，不再从可卖数量中扣除
 
 # ================= 分批次出售 =================
+# 仅在拿不到领导卖出比例时（交易里缺少领导的 pre/post 代币余额）作为回退
 SELL_STEPS = [
     0.25,  # 第一次 25% 总仓位
     0.40,  # 第二次 40% 剩余
@@ -66,6 +73,9 @@ FOLLOWER_PUBKEY = str(FOLLOWER_KEYPAIR.pubkey())
 # ================= 持仓与冷却（持久化） =================
 POSITIONS_FILE = "positions.json"
 _last_action_at: Dict[str, float] = {}   # mint -> timestamp
+_pending_sells: Dict[str, Dict[str, Any]] = {}   # mint -> 聚合窗口内的领导卖出（见 queue_follow_sell）
+_unconfirmed_sells: Dict[str, list] = {}         # mint -> 已广播、签名尚未确认的卖单
+_sell_locks: Dict[str, Dict[str, Any]] = {}      # mint -> {"lock", "users"}，同一代币的卖出串行执行
 
 def now_ts() -> float:
     return asyncio.get_event_loop().time()
@@ -130,6 +140,19 @@ async def rpc_get_balance(pubkey: str) -> int:
             data = await resp.json()
             return int(data.get("result", {}).get("value", 0))
 
+async def rpc_get_signature_statuses(signatures: list) -> list:
+    """getSignatureStatuses，按顺序返回每个签名的状态（未上链为 None）；请求失败返回 []"""
+    payload = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "getSignatureStatuses",
+        "params": [signatures, {"searchTransactionHistory": False}],
+    }
+    async with aiohttp.ClientSession() as session:
+        async with session.post(RPC_URL, json=payload, proxy=PROXY) as resp:
+            data = await resp.json()
+            return (data.get("result") or {}).get("value") or []
+
 # ================= 分类：是否为领导“买入/卖出”交易 =================
 def _account_keys_list(tx: Dict[str, Any]) -> list:
     ak = tx["transaction"]["message"]["accountKeys"]
@@ -202,6 +225,21 @@ def _token_delta_for_wallet(tx: dict, wallet: str, token_mint: str) -> int:
     return delta
 
 
+def _token_balance_pair_for_wallet(tx: Dict[str, Any], wallet: str, token_mint: str) -> Tuple[int, int]:
+    """
+    返回钱包某 SPL Token 在这笔交易前后的余额 (pre, post)，基础单位整数。
+    账户被关闭时 postTokenBalances 里没有该条目，按 0 计。
+    """
+    pre_list = tx["meta"].get("preTokenBalances", []) or []
+    post_list = tx["meta"].get("postTokenBalances", []) or []
+
+    pre = sum(int(t["uiTokenAmount"]["amount"]) for t in pre_list
+              if t.get("owner") == wallet and t.get("mint") == token_mint)
+    post = sum(int(t["uiTokenAmount"]["amount"]) for t in post_list
+               if t.get("owner") == wallet and t.get("mint") == token_mint)
+    return pre, post
+
+
 def get_spent_amount(tx: dict, wallet: str) -> int:
     """
     统一计算领导花了多少（优先 SOL，否则查 wSOL）
@@ -309,7 +347,7 @@ async def jupiter_swap(input_mint: str, output_mint: str, amount_in_base_units:
         async with aiohttp.ClientSession() as session:
             # 1) 报价（amount 用基础单位：SOL=lamports）
             quote_url = (
-                "https://quote-api.jup.ag/v6/quote"
+                f"{JUPITER_API_URL}/quote"
                 f"?inputMint={input_mint}&outputMint={output_mint}"
                 f"&amount={amount_in_base_units}&slippageBps={int(SLIPPAGE_TOLERANCE*10000)}"
             )
@@ -321,7 +359,7 @@ async def jupiter_swap(input_mint: str, output_mint: str, amount_in_base_units:
                     return None
 
             # 2) swap，Jupiter v6 直接用 quoteResponse
-            swap_url = "https://quote-api.jup.ag/v6/swap"
+            swap_url = f"{JUPITER_API_URL}/swap"
             body = {
                 "quoteResponse": quote,
                 "userPublicKey": FOLLOWER_PUBKEY,
@@ -412,7 +450,8 @@ async def get_token_balance(wallet_pubkey: str, token_mint: str) -> int:
     async with AsyncClient(RPC_URL) as client:
         resp = await client.get_token_accounts_by_owner(
             Pubkey.from_string(wallet_pubkey),
-            TokenAccountOpts(mint=Pubkey.from_string(token_mint))
+            TokenAccountOpts(mint=Pubkey.from_string(token_mint)),
+            commitment=Confirmed,   # 默认 finalized 会落后刚广播的交易很多秒
         )
 
         print("=== resp 原始返回 ===")
@@ -458,7 +497,7 @@ async def follow_buy(token_mint: str, leader_spent_lamports: int):
     sig = await jupiter_swap(SOL_MINT, token_mint, to_spend)
     if sig:
         # 等待交易确认
-        await asyncio.sleep(15)  # 简单粗暴：等 15 秒
+        await asyncio.sleep(BUY_CONFIRM_WAIT_SEC)  # 简单粗暴：等固定时间
         # 查询到账数量（需要你已经有 fetch_received_amount 函数）
         recv_qty = await fetch_received_amount(sig, token_mint)
 
@@ -479,13 +518,15 @@ async def follow_buy(token_mint: str, leader_spent_lamports: int):
             save_positions(POSITIONS)
             print(f"⚠️ {token_mint} 买入交易成功但未查询到到账数量")
 
-async def follow_sell(token_mint: str):
+async def follow_sell(token_mint: str, leader_sold_fraction: Optional[float] = None):
+    """
+    卖出跟单：
+    - leader_sold_fraction 为领导本轮卖掉的持仓比例（0~1），我们按同样比例卖出链上余额，一笔 swap 完成
+    - 为 None（拿不到领导余额）时回退到 SELL_STEPS 分批卖出
+    冷却由 queue_follow_sell 的聚合窗口代替，这里只记录时间。
+    """
     if not MIRROR_SELL:
         return
-
-    # 冷却
-    if token_mint in _last_action_at and now_ts() - _last_action_at[token_mint] < COOLDOWN_SEC:
-        return
     _last_action_at[token_mint] = now_ts()
 
     pos = POSITIONS.get(token_mint)
@@ -493,21 +534,47 @@ async def follow_sell(token_mint: str):
         print(f"ℹ️ 未记录 {token_mint} 数量，跳过卖出")
         return
 
+    # 先查未确认卖单的签名状态，再查余额：反过来的话，两次查询之间上链的卖单会被当成已确认而超卖
+    unconfirmed_qty = await _resolve_unconfirmed_sells(token_mint)
+
     # === 关键优化：实时查链上余额 ===
     chain_qty = await get_token_balance(FOLLOWER_PUBKEY, token_mint)
     if chain_qty <= 0:
         print(f"⚠️ 链上 {token_mint} 余额为 0，清理本地持仓记录")
+        _unconfirmed_sells.pop(token_mint, None)
         POSITIONS.pop(token_mint, None)
         save_positions(POSITIONS)
         return
 
-    # 用链上余额覆盖本地 qty，保证准确
-    pos["qty"] = chain_qty
-
-    qty = pos["qty"]
+    # 用链上余额覆盖本地 qty，保证准确；再扣掉已广播但链上还没体现的卖单
+    qty = chain_qty - unconfirmed_qty
     if qty <= 0:
-        print(f"ℹ️ {token_mint} 持仓为 0，跳过卖出")
-        POSITIONS.pop(token_mint, None)
+        print(f"ℹ️ {token_mint} 剩余持仓都在未确认的卖单里，跳过卖出")
+        return
+    pos["qty"] = qty
+
+    if leader_sold_fraction is not None:
+        # 按领导实际卖出比例卖出；领导清仓则我们也清仓（避免取整留下零头）
+        fraction = min(max(leader_sold_fraction, 0.0), 1.0)
+        sell_qty = qty if fraction >= 1.0 else int(qty * fraction)
+        if sell_qty <= 0:
+            print(f"ℹ️ {token_mint} 按领导比例 {fraction:.2%} 计算卖出数量为 0，跳过")
+            return
+
+        print(f"🔴 跟随卖出 {token_mint}，领导卖出 {fraction:.2%}，数量(基础单位)：{sell_qty}")
+        sig = await jupiter_swap(token_mint, SOL_MINT, sell_qty)
+        if not sig:
+            print(f"⚠️ {token_mint} 卖出失败")
+            return
+
+        qty -= sell_qty
+        _record_unconfirmed_sell(token_mint, sig, sell_qty)
+        if qty <= 0:
+            POSITIONS.pop(token_mint, None)
+            print(f"✅ {token_mint} 已全部卖出完成")
+        else:
+            pos["qty"] = qty
+            POSITIONS[token_mint] = pos
         save_positions(POSITIONS)
         return
 
@@ -533,6 +600,7 @@ async def follow_sell(token_mint: str):
 
     # 更新仓位和步骤
     qty -= sell_qty
+    _record_unconfirmed_sell(token_mint, sig, sell_qty)
     if qty <= 0 or step == len(SELL_STEPS) - 1:
         POSITIONS.pop(token_mint, None)  # 卖完清空
         print(f"✅ {token_mint} 已全部卖出完成")
@@ -543,6 +611,115 @@ async def follow_sell(token_mint: str):
 
     save_positions(POSITIONS)
 
+def _record_unconfirmed_sell(token_mint: str, sig: str, sell_qty: int):
+    """记录刚广播的卖单（按签名跟踪），顺带清掉所有代币里超时的记录，避免清仓后的代币一直占着"""
+    now = now_ts()
+    for mint in list(_unconfirmed_sells):
+        alive = [e for e in _unconfirmed_sells[mint] if now - e["at"] < SELL_CONFIRM_TIMEOUT_SEC]
+        if alive:
+            _unconfirmed_sells[mint] = alive
+        else:
+            _unconfirmed_sells.pop(mint)
+    _unconfirmed_sells.setdefault(token_mint, []).append({"sig": sig, "qty": sell_qty, "at": now})
+
+async def _resolve_unconfirmed_sells(token_mint: str) -> int:
+    """
+    返回该代币仍未确认的卖出数量。
+    jupiter_swap 广播即返回，链上余额要等确认后才变，不扣掉的话下一次卖出会按旧余额计算而超卖。
+    用 getSignatureStatuses 判断是否已上链（成功或失败都算结束），不看余额，所以不受期间买入影响；
+    超过 SELL_CONFIRM_TIMEOUT_SEC 仍未上链的视为丢失。查询失败时保守地全部保留。
+    """
+    now = now_ts()
+    entries = [e for e in _unconfirmed_sells.get(token_mint, []) if now - e["at"] < SELL_CONFIRM_TIMEOUT_SEC]
+    if entries:
+        statuses = await rpc_get_signature_statuses([e["sig"] for e in entries])
+        if len(statuses) == len(entries):
+            entries = [
+                e for e, st in zip(entries, statuses)
+                if not st or st.get("confirmationStatus") not in ("confirmed", "finalized")
+            ]
+    if entries:
+        _unconfirmed_sells[token_mint] = entries
+    else:
+        _unconfirmed_sells.pop(token_mint, None)
+    return sum(e["qty"] for e in entries)
+
+async def _wait_sells_confirmed(token_mint: str):
+    """清仓后等卖单确认再清理记录（最多 SELL_CONFIRM_TIMEOUT_SEC），清仓的代币不会再有卖出来触发清理"""
+    while token_mint in _unconfirmed_sells:
+        if await _resolve_unconfirmed_sells(token_mint) <= 0:
+            break
+        await asyncio.sleep(2)
+
+# ================= 卖出聚合（同一代币窗口内多笔卖出合并） =================
+def queue_follow_sell(token_mint: str, leader_pre: int, leader_post: int):
+    """
+    领导常把一个仓位拆成多笔快速卖出。第一笔到达时开启 SELL_AGGREGATE_WINDOW_SEC 窗口，
+    窗口内同一代币的后续卖出只合并领导的 pre/post 余额，窗口结束后按
+    (最大 pre - 最小 post) / 最大 pre 的比例执行一笔 swap。
+    窗口内只有卖出（领导买入会先关闭窗口，见 close_sell_window），余额单调递减，
+    所以最大 pre 就是最早的 pre、最小 post 就是最新的 post，也不受推送乱序影响。
+    领导清仓（post 为 0）时没有可再合并的了，立即关闭窗口。
+    """
+    if not MIRROR_SELL:
+        return
+
+    pending = _pending_sells.get(token_mint)
+    if pending is not None:
+        pending["leader_pre"] = max(pending["leader_pre"], leader_pre)
+        pending["leader_post"] = min(pending["leader_post"], leader_post)
+        pending["events"] += 1
+        print(f"🧺 合并领导卖出 {token_mint}（窗口内第 {pending['events']} 笔）")
+        if pending["leader_post"] <= 0:
+            close_sell_window(token_mint)
+        return
+
+    _pending_sells[token_mint] = {
+        "leader_pre": leader_pre,
+        "leader_post": leader_post,
+        "events": 1,
+    }
+    delay = 0 if leader_post <= 0 else SELL_AGGREGATE_WINDOW_SEC
+    # 保存 task 引用，避免被 GC 回收
+    _pending_sells[token_mint]["task"] = asyncio.create_task(_flush_pending_sell(token_mint, delay))
+
+def close_sell_window(token_mint: str):
+    """不再等待窗口结束，立即按已合并的卖出执行（领导清仓或在窗口内买入时调用）"""
+    pending = _pending_sells.get(token_mint)
+    if pending is None:
+        return
+    # 还在 _pending_sells 里说明 task 尚未出队，取消它不会丢单
+    pending["task"].cancel()
+    pending["task"] = asyncio.create_task(_flush_pending_sell(token_mint, 0))
+
+async def _flush_pending_sell(token_mint: str, delay: float):
+    if delay > 0:
+        await asyncio.sleep(delay)
+    # 先出队：swap 期间到达的新卖出会开启下一个窗口
+    pending = _pending_sells.pop(token_mint, None)
+    if not pending:
+        return
+
+    pre, post = pending["leader_pre"], pending["leader_post"]
+    fraction = (pre - post) / pre if pre > 0 else None
+    if pending["events"] > 1:
+        print(f"🧺 {token_mint} 窗口内合并 {pending['events']} 笔领导卖出")
+    # 同一代币的卖出串行：上一笔卖单记录完未确认数量后，下一笔才查余额
+    # 没人用的锁立即删除，否则每个交易过的代币都会留下一把锁
+    entry = _sell_locks.setdefault(token_mint, {"lock": asyncio.Lock(), "users": 0})
+    entry["users"] += 1
+    try:
+        async with entry["lock"]:
+            await follow_sell(token_mint, fraction)
+            if token_mint not in POSITIONS:
+                await _wait_sells_confirmed(token_mint)
+    except Exception as e:
+        print(f"❌ 聚合卖出异常: {e}")
+    finally:
+        entry["users"] -= 1
+        if entry["users"] == 0:
+            _sell_locks.pop(token_mint, None)
+
 async def get_token_holders(token_mint: str, helius_limit: int = 100, rpc_limit: int = 20) -> list[str]:
     """
     获取某个 SPL Token 的前 holders
@@ -550,7 +727,7 @@ async def get_token_holders(token_mint: str, helius_limit: int = 100, rpc_limit:
     如果失败，退回 RPC 的 getTokenLargestAccounts（最多 rpc_limit 个）
     """
     # 1️⃣ 尝试 Helius
-    helius_url = f"https://api.helius.xyz/v0/token-holders?api-key={API_KEY}&mint={token_mint}&limit={helius_limit}"
+    helius_url = f"{HELIUS_API_URL}/v0/token-holders?api-key={API_KEY}&mint={token_mint}&limit={helius_limit}"
     try:
         async with aiohttp.ClientSession() as session:
             async with session.get(helius_url) as resp:
@@ -645,6 +822,8 @@ async def listen_leader_logs():
                         # 计算领导花了多少 SOL（仅买入用得到）
                         sol_delta = get_spent_amount(tx, SMART_WALLET)
                         if kind == "buy":
+                            # 领导加仓：之前窗口里的卖出先按原比例结算，不与之后的卖出混算
+                            close_sell_window(mint)
                             leader_spent = abs(sol_delta) if sol_delta < 0 else int(0.01 * LAMPORTS_PER_SOL)
                             
                             # ✅ 这里加白名单/黑名单逻辑
@@ -654,7 +833,8 @@ async def listen_leader_logs():
                             # await asyncio.sleep(60)  # 等待买单确认，这里可以加入你的逻辑
                             await follow_buy(mint, leader_spent)
                         elif kind == "sell":
-                            await follow_sell(mint)
+                            leader_pre, leader_post = _token_balance_pair_for_wallet(tx, SMART_WALLET, mint)
+                            queue_follow_sell(mint, leader_pre, leader_post)
 
                     except Exception as e:
                         print(f"❌ 日志处理异常: {e}")